@@ -1,42 +1,64 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
+import sys
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import uvicorn
 
 # Import route modules
-from routes.upload import router as upload_router
-from routes.ask import router as ask_router
+from routes.upload import router as upload_router, shutdown_document_pool
+from routes.ask import router as ask_router, start_retrieval_batcher, stop_retrieval_batcher
 from routes.documents import router as documents_router
 
 # Import services for initialization
-from services.qdrant import ensure_collection_exists, delete_old_vectors, get_collection_info
-from services.supabase import cleanup_old_documents
+from services.qdrant import ensure_collection_exists, get_collection_info, close_qdrant_clients
+from services.embedding import close_embedding_client
+from services.supabase import close_supabase_clients
 from models.response_models import HealthResponse, APIResponse
 
 # Load environment variables
 load_dotenv()
 
-# Scheduler for cleanup tasks
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+# Environment variables the backend needs to serve requests
+REQUIRED_ENV_VARS = [
+    "SUPABASE_URL",
+    "SUPABASE_SERVICE_ROLE_KEY",
+    "QDRANT_URL",
+    "QDRANT_API_KEY",
+    "HUGGINGFACE_API_KEY",
+    "GEMINI_API_KEY"
+]
 
-scheduler = AsyncIOScheduler()
+# Upper bound on the Qdrant health probe so a hung vector store can't stall /health
+QDRANT_PROBE_TIMEOUT = 1.0
+
+# Daily cleanup time (UTC)
+CLEANUP_HOUR = 2
+CLEANUP_MINUTE = 0
 
 
 async def cleanup_task():
     """
     Scheduled cleanup task for old documents and vectors
     """
+    # Only needed by cleanup, so keep them off the startup import path
+    from services.qdrant import delete_old_vectors, delete_document_vectors
+    from services.supabase import cleanup_old_documents
+    
     try:
         print("Starting cleanup task...")
         
         # Cleanup old documents from Supabase
-        deleted_docs = await cleanup_old_documents(days_old=3)
-        print(f"Deleted {deleted_docs} old documents from database")
+        deleted_doc_ids = await cleanup_old_documents(days_old=3)
+        print(f"Deleted {len(deleted_doc_ids)} old documents from database")
+        
+        # Remove those documents' vectors in one filtered delete
+        deleted_doc_vectors = await delete_document_vectors(deleted_doc_ids, None)
+        print(f"Deleted {deleted_doc_vectors} vectors of old documents from Qdrant")
         
         # Cleanup old vectors from Qdrant
         deleted_vectors = await delete_old_vectors(days_old=3)
@@ -48,6 +70,35 @@ async def cleanup_task():
         print(f"Cleanup task failed: {str(e)}")
 
 
+def _check_env() -> tuple:
+    """
+    Return the missing required environment variables and the matching status string
+    """
+    missing_env_vars = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
+    env_status = "healthy" if not missing_env_vars else f"missing: {', '.join(missing_env_vars)}"
+    return missing_env_vars, env_status
+
+
+def _seconds_until_next_cleanup() -> float:
+    """
+    Seconds from now until the next daily cleanup run
+    """
+    now = datetime.now(timezone.utc)
+    next_run = now.replace(hour=CLEANUP_HOUR, minute=CLEANUP_MINUTE, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def _cleanup_loop():
+    """
+    Run the cleanup task once a day at CLEANUP_HOUR:CLEANUP_MINUTE UTC
+    """
+    while True:
+        await asyncio.sleep(_seconds_until_next_cleanup())
+        await cleanup_task()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -56,31 +107,59 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting DocChat RAG Backend...")
     
+    # Environment variables don't change at runtime, so check them once
+    app.state.missing_env, app.state.env_status = _check_env()
+    
+    # Validated once here; /health copies it with the per-request fields
+    app.state.health_template = HealthResponse(
+        status="healthy",
+        timestamp=datetime.now(timezone.utc),
+        services={}
+    )
+    
     try:
-        # Initialize Qdrant collection
+        # Initialize Qdrant collection and payload indexes; searches rely on
+        # this having run, uploads retry it if it failed here
         await ensure_collection_exists()
         print("Qdrant collection initialized")
         
-        # Start scheduler for cleanup tasks
-        scheduler.add_job(
-            cleanup_task,
-            CronTrigger(hour=2, minute=0),  # Run daily at 2:00 AM
-            id="cleanup_task",
-            replace_existing=True
-        )
-        scheduler.start()
-        print("Cleanup scheduler started")
-        
     except Exception as e:
         print(f"Startup error: {str(e)}")
     
+    # Start batching of question embedding + retrieval
+    start_retrieval_batcher()
+    print("Retrieval batcher started")
+    
+    # Start daily cleanup loop
+    app.state.cleanup_task = asyncio.create_task(_cleanup_loop())
+    print("Cleanup scheduler started")
+    
     yield
     
     # Shutdown
     print("Shutting down DocChat RAG Backend...")
     try:
-        scheduler.shutdown()
+        await stop_retrieval_batcher()
+        print("Retrieval batcher stopped")
+        
+        shutdown_document_pool()
+        print("Document workers stopped")
+        
+        app.state.cleanup_task.cancel()
+        try:
+            await app.state.cleanup_task
+        except asyncio.CancelledError:
+            pass
         print("Scheduler stopped")
+        
+        await close_embedding_client()
+        print("Embedding client closed")
+        
+        await close_qdrant_clients()
+        print("Qdrant clients closed")
+        
+        await close_supabase_clients()
+        print("Supabase clients closed")
     except Exception as e:
         print(f"Shutdown error: {str(e)}")
 
@@ -90,7 +169,8 @@ app = FastAPI(
     title=os.getenv("APP_NAME", "DocChat RAG Backend"),
     description="A production-ready FastAPI backend for document-based RAG system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -101,13 +181,13 @@ app.add_middleware(
         "https://doc-chat-bhdilanka-gmailcoms-projects.vercel.app",
         "https://doc-chat-git-main-bhdilanka-gmailcoms-projects.vercel.app",
         "https://docchat.dilankah.com",
-        "https://www.docchat.dilankah.com"
-        "localhost:3000",  # Local development
+        "https://www.docchat.dilankah.com",
         "http://localhost:3000",  # Local development with HTTP
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
+    allow_headers=["authorization", "content-type"],
+    max_age=86400,  # Let browsers cache preflight responses for 24h
 )
 
 # Include routers
@@ -129,40 +209,72 @@ async def root():
     }
 
 
+def _cleanup_running() -> bool:
+    """
+    Whether the daily cleanup loop is alive
+    """
+    cleanup = getattr(app.state, "cleanup_task", None)
+    return cleanup is not None and not cleanup.done()
+
+
+async def _probe_qdrant() -> tuple:
+    """
+    Check the Qdrant connection, giving up after QDRANT_PROBE_TIMEOUT seconds
+    """
+    try:
+        qdrant_info = await asyncio.wait_for(get_collection_info(), timeout=QDRANT_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return "unhealthy: timed out", {}
+    except Exception as e:
+        return f"unhealthy: {str(e)}", {}
+    
+    return ("unhealthy" if "error" in qdrant_info else "healthy"), qdrant_info
+
+
+async def _probe_env() -> str:
+    """
+    Report the environment status (checked once at startup)
+    """
+    return getattr(app.state, "env_status", None) or _check_env()[1]
+
+
+def _health_response(status: str, services: dict) -> HealthResponse:
+    """
+    Build a health response by copying the startup template, which skips full model validation
+    """
+    update = {"status": status, "timestamp": datetime.now(timezone.utc), "services": services}
+    template = getattr(app.state, "health_template", None)
+    
+    if template is None:
+        return HealthResponse(**update)
+    
+    return template.model_copy(update=update)
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
     Health check endpoint
     """
     try:
-        # Check Qdrant connection
-        qdrant_status = "healthy"
-        qdrant_info = {}
-        try:
-            qdrant_info = await get_collection_info()
-            if "error" in qdrant_info:
-                qdrant_status = "unhealthy"
-        except Exception as e:
-            qdrant_status = f"unhealthy: {str(e)}"
+        # Run independent probes concurrently
+        qdrant_result, env_result = await asyncio.gather(
+            _probe_qdrant(),
+            _probe_env(),
+            return_exceptions=True
+        )
         
-        # Check environment variables
-        required_env_vars = [
-            "SUPABASE_URL",
-            "SUPABASE_SERVICE_ROLE_KEY",
-            "QDRANT_URL",
-            "QDRANT_API_KEY",
-            "HUGGINGFACE_API_KEY",
-            "GEMINI_API_KEY"
-        ]
+        if isinstance(qdrant_result, Exception):
+            qdrant_status, qdrant_info = f"unhealthy: {str(qdrant_result)}", {}
+        else:
+            qdrant_status, qdrant_info = qdrant_result
         
-        missing_env_vars = [var for var in required_env_vars if not os.getenv(var)]
-        env_status = "healthy" if not missing_env_vars else f"missing: {', '.join(missing_env_vars)}"
+        env_status = env_result if not isinstance(env_result, Exception) else f"unhealthy: {str(env_result)}"
         
         overall_status = "healthy" if qdrant_status == "healthy" and env_status == "healthy" else "unhealthy"
         
-        return HealthResponse(
+        return _health_response(
             status=overall_status,
-            timestamp=datetime.utcnow(),
             services={
                 "qdrant": {
                     "status": qdrant_status,
@@ -172,16 +284,14 @@ async def health_check():
                     "status": env_status
                 },
                 "scheduler": {
-                    "status": "running" if scheduler.running else "stopped",
-                    "jobs": len(scheduler.get_jobs())
+                    "status": "running" if _cleanup_running() else "stopped"
                 }
             }
         )
     
     except Exception as e:
-        return HealthResponse(
+        return _health_response(
             status="unhealthy",
-            timestamp=datetime.utcnow(),
             services={"error": str(e)}
         )
 
@@ -210,7 +320,7 @@ async def http_exception_handler(request, exc):
     """
     Global HTTP exception handler
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
@@ -225,7 +335,7 @@ async def general_exception_handler(request, exc):
     """
     Global exception handler for unhandled exceptions
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -240,5 +350,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8000,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",  # uvloop is not available on Windows
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
         reload=os.getenv("DEBUG", "False").lower() == "true"
     )
@@ -1,64 +1,293 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from models.request_models import QuestionRequest
 from models.response_models import APIResponse, QuestionResponse, SourceChunk
-from services.embedding import get_single_embedding
-from services.qdrant import search_similar_chunks
-from services.inference import generate_answer
-from services.supabase import get_document_by_ids, create_chat_session, save_message
-from utils.auth import get_current_user, verify_user_owns_documents
-from typing import List
+from services.embedding import get_single_embedding, get_question_embeddings
+from services.qdrant import search_similar_chunks, search_similar_chunks_batch
+from services.inference import generate_answer, generate_answer_stream
+from services.supabase import get_documents_for_ask, create_chat_session, save_message
+from utils.auth import get_current_user
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import orjson
 
 router = APIRouter()
 
+# Chunks retrieved per question; token-sized chunks carry enough context that 3 suffice
+RETRIEVAL_LIMIT = 3
 
-@router.post("/ask_question", response_model=APIResponse)
-async def ask_question(
-    request: QuestionRequest,
-    current_user: str = Depends(get_current_user)
-):
+# Retrieval batching: concurrent questions are coalesced into one embedding
+# call and one Qdrant batch query per tick
+MAX_BATCH = 32
+BATCH_WINDOW_SECONDS = 0.005
+
+_retrieval_queue: Optional[asyncio.Queue] = None
+_retrieval_worker: Optional[asyncio.Task] = None
+_retrieval_batches: set = set()
+
+
+async def _run_retrieval_batch(batch: list):
     """
-    Answer a question based on selected documents
+    Embed and search a batch of queued questions, resolving each caller's future
     """
     try:
-        # Verify user owns all specified documents
-        if request.document_ids and not verify_user_owns_documents(current_user, request.document_ids):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to access one or more specified documents"
-            )
+        embeddings = await get_question_embeddings(
+            [question for question, _, _, _, _ in batch]
+        )
         
-        # Validate that documents exist and are completed
-        if request.document_ids:
-            documents = await get_document_by_ids(request.document_ids, current_user)
-            
-            if len(documents) != len(request.document_ids):
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="One or more documents not found"
-                )
+        if len(embeddings) != len(batch):
+            raise Exception("Mismatch between number of questions and embeddings")
+        
+        queries = []
+        pending = []
+        for (question, user_id, document_ids, limit, future), embedding in zip(batch, embeddings):
+            if not embedding:
+                if not future.done():
+                    future.set_exception(Exception("Failed to generate embedding for the question"))
+                continue
             
-            # Check if all documents are completed
-            incomplete_docs = [doc for doc in documents if doc["status"] != "completed"]
-            if incomplete_docs:
-                incomplete_names = [doc["name"] for doc in incomplete_docs]
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"The following documents are not ready: {', '.join(incomplete_names)}"
-                )
+            queries.append({
+                "query_embedding": embedding,
+                "user_id": user_id,
+                "document_ids": document_ids,
+                "limit": limit
+            })
+            pending.append(future)
         
-        # Generate embedding for the question
-        question_embedding = await get_single_embedding(request.question)
+        results = await search_similar_chunks_batch(queries)
+        
+        for future, chunks in zip(pending, results):
+            if not future.done():
+                future.set_result(chunks)
+    
+    except Exception as e:
+        for *_, future in batch:
+            if not future.done():
+                future.set_exception(e)
+
+
+async def _retrieval_batch_worker(queue: asyncio.Queue):
+    """
+    Drain up to MAX_BATCH queued questions (or whatever arrives within
+    BATCH_WINDOW_SECONDS) and dispatch them as one batch
+    """
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + BATCH_WINDOW_SECONDS
+        
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        # Run the batch in its own task so the next tick can start collecting
+        task = asyncio.create_task(_run_retrieval_batch(batch))
+        _retrieval_batches.add(task)
+        task.add_done_callback(_retrieval_batches.discard)
+
+
+def start_retrieval_batcher():
+    """
+    Start the background retrieval batcher (called from the app lifespan)
+    """
+    global _retrieval_queue, _retrieval_worker
+    
+    if _retrieval_worker is not None and not _retrieval_worker.done():
+        return
+    
+    _retrieval_queue = asyncio.Queue()
+    _retrieval_worker = asyncio.create_task(_retrieval_batch_worker(_retrieval_queue))
+
+
+async def stop_retrieval_batcher():
+    """
+    Stop the background retrieval batcher and fail any questions still queued
+    """
+    global _retrieval_queue, _retrieval_worker
+    
+    queue, worker = _retrieval_queue, _retrieval_worker
+    _retrieval_queue, _retrieval_worker = None, None
+    
+    if worker is not None:
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+    
+    while queue is not None and not queue.empty():
+        *_, future = queue.get_nowait()
+        if not future.done():
+            future.set_exception(Exception("Retrieval batcher stopped"))
+
+
+async def retrieve_similar_chunks(
+    question: str,
+    user_id: str,
+    document_ids: Optional[List[str]] = None,
+    limit: int = RETRIEVAL_LIMIT
+) -> List[dict]:
+    """
+    Embed a question and search for similar chunks, going through the
+    retrieval batcher when it is running
+    """
+    if _retrieval_queue is None:
+        # Batcher not started (e.g. app used without lifespan), query directly
+        question_embedding = await get_single_embedding(question)
         
         if not question_embedding:
             raise Exception("Failed to generate embedding for the question")
         
-        # Search for similar chunks
-        similar_chunks = await search_similar_chunks(
+        return await search_similar_chunks(
             query_embedding=question_embedding,
+            user_id=user_id,
+            document_ids=document_ids,
+            limit=limit
+        )
+    
+    future = asyncio.get_running_loop().create_future()
+    await _retrieval_queue.put((question, user_id, document_ids, limit, future))
+    return await future
+
+
+async def _persist_chat(user_id: str, question: str, answer: str, source_refs: List[str]):
+    """
+    Save a question/answer exchange as a new chat session
+    """
+    try:
+        # Create a simple session title from the question
+        session_title = question[:50] + "..." if len(question) > 50 else question
+        session_id = await create_chat_session(user_id, session_title)
+        
+        # Save user question
+        await save_message(
+            session_id=session_id,
+            user_id=user_id,
+            content=question,
+            role="user"
+        )
+        
+        # Save assistant answer with sources
+        await save_message(
+            session_id=session_id,
+            user_id=user_id,
+            content=answer,
+            role="assistant",
+            sources=source_refs
+        )
+    except Exception as e:
+        print(f"Failed to save chat: {str(e)}")
+
+
+async def _validate_documents(request: QuestionRequest, current_user: str) -> Dict[str, str]:
+    """
+    Check that the requested documents exist, belong to the user and are completed.
+    Returns a document_id -> name map for the requested documents.
+    """
+    if not request.document_ids:
+        return {}
+    
+    documents = await get_documents_for_ask(request.document_ids, current_user)
+    
+    if len(documents) != len(request.document_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="One or more documents not found"
+        )
+    
+    # Check if all documents are completed
+    incomplete_docs = [doc for doc in documents if doc["status"] != "completed"]
+    if incomplete_docs:
+        incomplete_names = [doc["name"] for doc in incomplete_docs]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The following documents are not ready: {', '.join(incomplete_names)}"
+        )
+    
+    return {doc["id"]: doc["name"] for doc in documents}
+
+
+async def _attach_document_names(similar_chunks: List[dict], document_names: Dict[str, str], user_id: str) -> List[dict]:
+    """
+    Fill in document_name, which Qdrant payloads no longer carry, from the
+    documents already validated (or one lookup for any others)
+    """
+    missing_ids = list({
+        chunk["document_id"] for chunk in similar_chunks
+        if chunk["document_name"] is None and chunk["document_id"] not in document_names
+    })
+    if missing_ids:
+        documents = await get_documents_for_ask(missing_ids, user_id)
+        document_names = {**document_names, **{doc["id"]: doc["name"] for doc in documents}}
+    
+    return [
+        chunk if chunk["document_name"] is not None
+        else {**chunk, "document_name": document_names.get(chunk["document_id"], "Unknown document")}
+        for chunk in similar_chunks
+    ]
+
+
+def _truncate(text: str, max_length: int = 500) -> str:
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+def _build_context(similar_chunks: List[dict]) -> Tuple[List[dict], List[SourceChunk]]:
+    """
+    Split retrieved chunks into LLM context and truncated source references
+    """
+    # Retrieved chunks already carry document_name and text, which is all the LLM prompt reads
+    context_chunks = similar_chunks
+    
+    # Fields come from our own Qdrant payloads and documents table, so skip pydantic validation
+    source_chunks = [
+        SourceChunk.model_construct(
+            document_id=chunk["document_id"],
+            document_name=chunk["document_name"],
+            chunk_text=_truncate(chunk["text"]),
+            score=chunk["score"]
+        )
+        for chunk in similar_chunks
+    ]
+    
+    return context_chunks, source_chunks
+
+
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """
+    Format a Server-Sent Events frame; multi-line data is split across data: lines
+    """
+    frame = f"event: {event}\n" if event else ""
+    frame += "".join(f"data: {line}\n" for line in data.split("\n"))
+    return frame + "\n"
+
+
+@router.post("/ask_question", response_model=APIResponse)
+async def ask_question(
+    request: QuestionRequest,
+    background_tasks: BackgroundTasks,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Answer a question based on selected documents
+    """
+    try:
+        # Validate that documents exist, belong to the user and are completed
+        document_names = await _validate_documents(request, current_user)
+        
+        # Embed the question and search for similar chunks
+        similar_chunks = await retrieve_similar_chunks(
+            question=request.question,
             user_id=current_user,
             document_ids=request.document_ids,
-            limit=5
+            limit=RETRIEVAL_LIMIT
         )
+        similar_chunks = await _attach_document_names(similar_chunks, document_names, current_user)
         
         if not similar_chunks:
             return APIResponse(
@@ -72,21 +301,7 @@ async def ask_question(
             )
         
         # Prepare context for LLM
-        context_chunks = []
-        source_chunks = []
-        
-        for chunk in similar_chunks:
-            context_chunks.append({
-                "document_name": chunk["document_name"],
-                "text": chunk["text"]
-            })
-            
-            source_chunks.append(SourceChunk(
-                document_id=chunk["document_id"],
-                document_name=chunk["document_name"],
-                chunk_text=chunk["text"][:500] + "..." if len(chunk["text"]) > 500 else chunk["text"],
-                score=chunk["score"]
-            ))
+        context_chunks, source_chunks = _build_context(similar_chunks)
         
         # Generate answer using LLM
         answer = await generate_answer(request.question, context_chunks)
@@ -98,32 +313,9 @@ async def ask_question(
             question=request.question
         )
         
-        # Optional: Save conversation to database
-        try:
-            # Create a simple session title from the question
-            session_title = request.question[:50] + "..." if len(request.question) > 50 else request.question
-            session_id = await create_chat_session(current_user, session_title)
-            
-            # Save user question
-            await save_message(
-                session_id=session_id,
-                user_id=current_user,
-                content=request.question,
-                role="user"
-            )
-            
-            # Save assistant answer with sources
-            source_refs = [f"{chunk.document_name}" for chunk in source_chunks]
-            await save_message(
-                session_id=session_id,
-                user_id=current_user,
-                content=answer,
-                role="assistant",
-                sources=source_refs
-            )
-        except Exception as e:
-            # Don't fail the request if chat saving fails
-            print(f"Failed to save chat: {str(e)}")
+        # Save conversation to database after the response is sent
+        source_refs = [f"{chunk.document_name}" for chunk in source_chunks]
+        background_tasks.add_task(_persist_chat, current_user, request.question, answer, source_refs)
         
         return APIResponse(
             success=True,
@@ -141,9 +333,71 @@ async def ask_question(
         )
 
 
+@router.post("/ask_question/stream")
+async def ask_question_stream(
+    request: QuestionRequest,
+    background_tasks: BackgroundTasks,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Answer a question based on selected documents, streaming the answer as
+    Server-Sent Events followed by a final "sources" event
+    """
+    try:
+        # Validate that documents exist, belong to the user and are completed
+        document_names = await _validate_documents(request, current_user)
+        
+        # Embed the question and search for similar chunks
+        similar_chunks = await retrieve_similar_chunks(
+            question=request.question,
+            user_id=current_user,
+            document_ids=request.document_ids,
+            limit=RETRIEVAL_LIMIT
+        )
+        similar_chunks = await _attach_document_names(similar_chunks, document_names, current_user)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        return APIResponse(
+            success=False,
+            message="Failed to answer question",
+            error=str(e)
+        )
+    
+    context_chunks, source_chunks = _build_context(similar_chunks)
+    answer_parts = []
+    
+    async def event_stream():
+        try:
+            if not similar_chunks:
+                yield _sse_event("I couldn't find relevant information in the specified documents to answer your question.")
+            else:
+                async for text in generate_answer_stream(request.question, context_chunks):
+                    answer_parts.append(text)
+                    yield _sse_event(text)
+            
+            sources = [chunk.model_dump() for chunk in source_chunks]
+            yield _sse_event(orjson.dumps(sources).decode(), event="sources")
+        
+        except Exception as e:
+            yield _sse_event(str(e), event="error")
+    
+    async def persist_streamed_chat():
+        if answer_parts:
+            source_refs = [f"{chunk.document_name}" for chunk in source_chunks]
+            await _persist_chat(current_user, request.question, "".join(answer_parts).strip(), source_refs)
+    
+    # Save conversation to database after the stream completes
+    background_tasks.add_task(persist_streamed_chat)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/ask_quick", response_model=APIResponse)
 async def ask_quick_question(
     question: str,
+    background_tasks: BackgroundTasks,
     current_user: str = Depends(get_current_user)
 ):
     """
@@ -157,7 +411,7 @@ async def ask_quick_question(
             user_id=current_user
         )
         
-        return await ask_question(request, current_user)
+        return await ask_question(request, background_tasks, current_user)
     
     except Exception as e:
         return APIResponse(
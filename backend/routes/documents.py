@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Path
-from models.request_models import DocumentDeleteRequest
-from models.response_models import APIResponse, DocumentListResponse, DocumentDeleteResponse
-from services.supabase import get_user_documents, delete_document_metadata, delete_file_from_storage, get_document_metadata
+from fastapi.responses import ORJSONResponse
+from models.response_models import APIResponse, DocumentDeleteResponse
+from services.supabase import get_user_documents, get_user_document_stats, delete_document_metadata, delete_file_from_storage, get_document_metadata
 from services.qdrant import delete_document_vectors
-from utils.auth import get_current_user, verify_user_owns_document, verify_user_owns_documents, verify_user_owns_documents
-from typing import List
+from utils.auth import get_current_user, verify_user_owns_document, verify_user_owns_documents
+from typing import List, Dict, Tuple
+import asyncio
 
 router = APIRouter()
 
 
-@router.get("/documents", response_model=APIResponse)
+@router.get("/documents", response_model=None)
 async def get_documents(
     current_user: str = Depends(get_current_user),
     status_filter: str = None,
@@ -20,39 +21,24 @@ async def get_documents(
     Get list of user's documents with optional filtering
     """
     try:
-        # Get all user documents
-        documents = await get_user_documents(current_user)
-        
-        # Apply status filter if specified
-        if status_filter:
-            documents = [doc for doc in documents if doc["status"] == status_filter]
-        
-        # Apply pagination
-        total_count = len(documents)
-        paginated_docs = documents[offset:offset + limit]
-        
-        # Format response
-        formatted_docs = []
-        for doc in paginated_docs:
-            formatted_docs.append({
-                "id": doc["id"],
-                "name": doc["name"],
-                "file_type": doc["file_type"],
-                "file_size": doc["file_size"],
-                "status": doc["status"],
-                "error_message": doc.get("error_message"),
-                "created_at": doc["created_at"],
-                "updated_at": doc["updated_at"]
-            })
-        
-        return APIResponse(
-            success=True,
-            message=f"Retrieved {len(formatted_docs)} documents",
-            data=DocumentListResponse(
-                documents=formatted_docs,
-                total_count=total_count
-            )
+        # Get the requested page of user documents (rows carry exactly the listing columns)
+        documents, total_count = await get_user_documents(
+            current_user,
+            status=status_filter,
+            limit=limit,
+            offset=offset
         )
+        
+        # Documents are plain dicts from the database, so skip response model validation
+        return ORJSONResponse({
+            "success": True,
+            "message": f"Retrieved {len(documents)} documents",
+            "data": {
+                "documents": documents,
+                "total_count": total_count
+            },
+            "error": None
+        })
     
     except Exception as e:
         return APIResponse(
@@ -72,7 +58,7 @@ async def get_document(
     """
     try:
         # Verify user owns the document
-        if not verify_user_owns_document(current_user, document_id):
+        if not await verify_user_owns_document(current_user, document_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this document"
@@ -113,7 +99,7 @@ async def delete_document(
     """
     try:
         # Verify user owns the document
-        if not verify_user_owns_document(current_user, document_id):
+        if not await verify_user_owns_document(current_user, document_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to delete this document"
@@ -163,6 +149,27 @@ async def delete_document(
         )
 
 
+async def _delete_one(doc_id: str, user_id: str) -> Tuple[bool, Dict]:
+    """
+    Delete a single document's file and metadata (vectors are deleted in bulk)
+    """
+    # Get document info
+    document = await get_document_metadata(doc_id, user_id)
+    if not document:
+        return False, {"id": doc_id, "error": "Document not found"}
+    
+    # Delete file
+    try:
+        await delete_file_from_storage(document["file_path"])
+    except Exception:
+        pass  # Continue with metadata deletion
+    
+    # Delete metadata
+    await delete_document_metadata(doc_id, user_id)
+    
+    return True, {"id": doc_id, "name": document["name"]}
+
+
 @router.delete("/documents", response_model=APIResponse)
 async def delete_multiple_documents(
     document_ids: List[str],
@@ -179,47 +186,38 @@ async def delete_multiple_documents(
             )
         
         # Verify user owns all documents
-        if not verify_user_owns_documents(current_user, document_ids):
+        if not await verify_user_owns_documents(current_user, document_ids):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to delete one or more specified documents"
             )
         
+        async def _delete_vectors() -> int:
+            try:
+                return await delete_document_vectors(document_ids, current_user)
+            except Exception:
+                return 0  # Continue with file and metadata deletion
+        
+        vectors_result, *results = await asyncio.gather(
+            _delete_vectors(),
+            *[_delete_one(doc_id, current_user) for doc_id in document_ids],
+            return_exceptions=True
+        )
+        
         deleted_docs = []
         failed_docs = []
-        total_vectors_deleted = 0
+        total_vectors_deleted = vectors_result
         
-        for doc_id in document_ids:
-            try:
-                # Get document info
-                document = await get_document_metadata(doc_id, current_user)
-                if not document:
-                    failed_docs.append({"id": doc_id, "error": "Document not found"})
-                    continue
-                
-                # Delete vectors
-                try:
-                    vectors_count = await delete_document_vectors(doc_id, current_user)
-                    total_vectors_deleted += vectors_count
-                except Exception:
-                    pass  # Continue with file and metadata deletion
-                
-                # Delete file
-                try:
-                    await delete_file_from_storage(document["file_path"])
-                except Exception:
-                    pass  # Continue with metadata deletion
-                
-                # Delete metadata
-                await delete_document_metadata(doc_id, current_user)
-                
-                deleted_docs.append({
-                    "id": doc_id,
-                    "name": document["name"]
-                })
+        for doc_id, result in zip(document_ids, results):
+            if isinstance(result, Exception):
+                failed_docs.append({"id": doc_id, "error": str(result)})
+                continue
             
-            except Exception as e:
-                failed_docs.append({"id": doc_id, "error": str(e)})
+            ok, info = result
+            if ok:
+                deleted_docs.append(info)
+            else:
+                failed_docs.append(info)
         
         result_message = f"Successfully deleted {len(deleted_docs)} documents"
         if failed_docs:
@@ -245,7 +243,7 @@ async def delete_multiple_documents(
         )
 
 
-@router.get("/documents/stats", response_model=APIResponse)
+@router.get("/documents/stats", response_model=None)
 async def get_document_stats(
     current_user: str = Depends(get_current_user)
 ):
@@ -253,25 +251,22 @@ async def get_document_stats(
     Get statistics about user's documents
     """
     try:
-        documents = await get_user_documents(current_user)
+        rows = await get_user_document_stats(current_user)
         
-        # Calculate statistics
-        total_docs = len(documents)
-        status_counts = {}
+        # Assemble statistics from the grouped rows
+        total_docs = 0
         total_size = 0
+        status_counts = {}
         file_type_counts = {}
         
-        for doc in documents:
-            # Status counts
-            status = doc["status"]
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # Total size
-            total_size += doc["file_size"]
-            
-            # File type counts
-            file_type = doc["file_type"]
-            file_type_counts[file_type] = file_type_counts.get(file_type, 0) + 1
+        for row in rows:
+            if row["status"] is not None:
+                status_counts[row["status"]] = row["count"]
+            elif row["file_type"] is not None:
+                file_type_counts[row["file_type"]] = row["count"]
+            else:
+                total_docs = row["count"]
+                total_size = row["total_size"] or 0
         
         stats = {
             "total_documents": total_docs,
@@ -284,11 +279,12 @@ async def get_document_stats(
             "error_documents": status_counts.get("error", 0)
         }
         
-        return APIResponse(
-            success=True,
-            message="Document statistics retrieved successfully",
-            data=stats
-        )
+        return ORJSONResponse({
+            "success": True,
+            "message": "Document statistics retrieved successfully",
+            "data": stats,
+            "error": None
+        })
     
     except Exception as e:
         return APIResponse(
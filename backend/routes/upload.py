@@ -2,15 +2,134 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from models.request_models import DocumentUploadRequest
 from models.response_models import APIResponse, DocumentUploadResponse
 from services.supabase import get_document_metadata, update_document_status, download_file_from_storage
-from services.embedding import get_batch_embeddings
-from services.qdrant import store_document_chunks
+from services.embedding import get_batch_embeddings, EMBEDDING_BATCH_SIZE, MAX_IN_FLIGHT
+from services.qdrant import ensure_collection_exists, store_chunk_batch, delete_document_vectors
 from utils.chunking import process_document
 from utils.auth import get_current_user, verify_user_owns_document
 import os
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
 
 router = APIRouter()
 
+# Text extraction and chunking are blocking and CPU-bound, so they run in worker
+# processes. PDFium is not thread-safe; each worker process runs one extraction
+# at a time, and a PDFium crash takes down the worker instead of the server.
+DOCUMENT_WORKERS = min(4, os.cpu_count() or 1)
+_document_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_document_pool() -> ProcessPoolExecutor:
+    global _document_pool
+    
+    if _document_pool is None:
+        # spawn: forking a process that holds gRPC and event loop threads is unsafe
+        _document_pool = ProcessPoolExecutor(
+            max_workers=DOCUMENT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    return _document_pool
+
+
+def shutdown_document_pool():
+    """
+    Stop the document processing workers (called from the app lifespan)
+    """
+    global _document_pool
+    
+    if _document_pool is not None:
+        _document_pool.shutdown(wait=False, cancel_futures=True)
+        _document_pool = None
+
+
+async def _process_document_in_worker(file_path: str, file_type: str) -> list:
+    """
+    Extract and chunk a document in the worker process pool
+    """
+    global _document_pool
+    
+    pool = _get_document_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, process_document, file_path, file_type)
+    except BrokenProcessPool:
+        # A worker died (e.g. a malformed PDF crashed PDFium); start a fresh pool next time
+        if _document_pool is pool:
+            _document_pool = None
+        raise Exception("Document processing worker crashed")
+
+
+# Chunks per pipeline step; sized so each step still fans out MAX_IN_FLIGHT embedding requests
+PIPELINE_BATCH_SIZE = EMBEDDING_BATCH_SIZE * MAX_IN_FLIGHT
+PIPELINE_QUEUE_SIZE = 4
+
+
+async def _embed_and_store_chunks(
+    document_id: str,
+    user_id: str,
+    chunks: list
+) -> int:
+    """
+    Embed and store chunks as an overlapping pipeline: while one slice is
+    being upserted into Qdrant, the next slice is already being embedded
+    """
+    await ensure_collection_exists()
+    
+    # Clear the previous version first: points written before ids became
+    # deterministic (random uuid4) would not be overwritten by this upload
+    await delete_document_vectors(document_id, user_id)
+    
+    chunk_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    upsert_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    
+    async def produce():
+        for start in range(0, len(chunks), PIPELINE_BATCH_SIZE):
+            await chunk_queue.put((start, chunks[start:start + PIPELINE_BATCH_SIZE]))
+        await chunk_queue.put(None)
+    
+    async def embed_worker():
+        while (item := await chunk_queue.get()) is not None:
+            start, batch = item
+            embeddings = await get_batch_embeddings(batch)
+            
+            if len(embeddings) != len(batch):
+                raise Exception("Mismatch between number of chunks and embeddings")
+            
+            await upsert_queue.put((start, batch, embeddings))
+        await upsert_queue.put(None)
+    
+    async def upsert_worker() -> int:
+        stored_count = 0
+        while (item := await upsert_queue.get()) is not None:
+            start, batch, embeddings = item
+            stored_count += await store_chunk_batch(
+                document_id=document_id,
+                user_id=user_id,
+                chunks=batch,
+                embeddings=embeddings,
+                start_index=start
+            )
+        return stored_count
+    
+    tasks = [
+        asyncio.create_task(produce()),
+        asyncio.create_task(embed_worker()),
+        asyncio.create_task(upsert_worker())
+    ]
+    
+    try:
+        _, _, stored_count = await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed stage would leave the others blocked on their queues
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    return stored_count
+
 
 @router.post("/upload_document", response_model=APIResponse)
 async def upload_document(
@@ -22,7 +141,7 @@ async def upload_document(
     """
     try:
         # Verify user owns the document
-        if not verify_user_owns_document(current_user, request.document_id):
+        if not await verify_user_owns_document(current_user, request.document_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this document"
@@ -45,24 +164,16 @@ async def upload_document(
         try:
             # Process document (extract text and chunk)
             file_extension = doc_metadata["file_type"].lower()
-            chunks = process_document(temp_file_path, file_extension)
+            chunks = await _process_document_in_worker(temp_file_path, file_extension)
             
             if not chunks:
                 raise Exception("No text chunks could be extracted from the document")
             
-            # Generate embeddings for chunks
-            embeddings = await get_batch_embeddings(chunks)
-            
-            if len(embeddings) != len(chunks):
-                raise Exception("Mismatch between number of chunks and embeddings")
-            
-            # Store chunks and embeddings in Qdrant
-            stored_count = await store_document_chunks(
+            # Generate embeddings and store them in Qdrant
+            stored_count = await _embed_and_store_chunks(
                 document_id=request.document_id,
                 user_id=current_user,
-                document_name=doc_metadata["name"],
-                chunks=chunks,
-                embeddings=embeddings
+                chunks=chunks
             )
             
             # Update document status to completed
@@ -109,7 +220,7 @@ async def reprocess_document(
     """
     try:
         # Verify user owns the document
-        if not verify_user_owns_document(current_user, document_id):
+        if not await verify_user_owns_document(current_user, document_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this document"
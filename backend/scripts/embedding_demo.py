@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Demo of the Hugging Face embedding client: embeds a few sentences and
+prints their cosine similarities, like the sentence-transformers example
+"""
+
+import asyncio
+import sys
+import os
+from typing import List
+
+import numpy as np
+
+# Add the backend directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding import get_embeddings
+
+
+def _l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows in place (zero vectors are left as zeros)
+    """
+    embeddings /= np.linalg.norm(embeddings, axis=-1, keepdims=True).clip(min=1e-12)
+    return embeddings
+
+
+def calculate_similarity(embeddings: List[List[float]]) -> np.ndarray:
+    """
+    Calculate cosine similarity matrix for embeddings
+    Similar to model.similarity() in sentence-transformers
+    """
+    normalized = _l2_normalize(np.array(embeddings, dtype=np.float32))
+    return normalized @ normalized.T
+
+
+def find_most_similar(query_embedding: List[float], 
+                     candidate_embeddings: List[List[float]], 
+                     top_k: int = 5) -> List[tuple]:
+    """
+    Find most similar embeddings to a query embedding
+    Returns list of (index, similarity_score) tuples
+    """
+    query_norm = _l2_normalize(np.array(query_embedding, dtype=np.float32))
+    candidates_norm = _l2_normalize(np.array(candidate_embeddings, dtype=np.float32))
+    
+    similarities = candidates_norm @ query_norm
+    
+    # Select the top k in O(N), then sort only those
+    top_k = min(top_k, len(similarities))
+    if top_k <= 0:
+        return []
+    top_indices = np.argpartition(similarities, -top_k)[-top_k:]
+    top_indices = top_indices[np.argsort(similarities[top_indices])[::-1]]
+    return [(int(idx), float(similarities[idx])) for idx in top_indices]
+
+
+async def main():
+    """
+    Main function - equivalent to the sentence-transformers example
+    """
+    # Same sentences as in the HF example
+    sentences = [
+        "That is a happy person",
+        "That is a happy dog",
+        "That is a very happy person",
+        "Today is a sunny day"
+    ]
+    
+    print("Getting embeddings from Hugging Face API...")
+    try:
+        # Get embeddings (equivalent to model.encode(sentences))
+        embeddings = await get_embeddings(sentences)
+        print(f"✓ Successfully got {len(embeddings)} embeddings")
+        print(f"✓ Each embedding has {len(embeddings[0])} dimensions")
+        
+        # Calculate similarities (equivalent to model.similarity(embeddings, embeddings))
+        similarities = calculate_similarity(embeddings)
+        print(f"✓ Similarity matrix shape: {similarities.shape}")  # Should be [4, 4]
+        
+        # Print the similarity matrix
+        print("\nSimilarity Matrix:")
+        print(similarities)
+        
+        # Show detailed similarities
+        print("\nDetailed Similarities:")
+        for i, sentence1 in enumerate(sentences):
+            print(f"\n'{sentence1}':")
+            for j, sentence2 in enumerate(sentences):
+                if i != j:  # Skip self-similarity
+                    print(f"  vs '{sentence2}': {similarities[i][j]:.4f}")
+        
+        # Find most similar to first sentence
+        print(f"\nMost similar to '{sentences[0]}':")
+        most_similar = find_most_similar(embeddings[0], embeddings)
+        for idx, score in most_similar:
+            print(f"  {idx}: '{sentences[idx]}' - {score:.4f}")
+            
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        print("Make sure you have:")
+        print("1. Set HUGGINGFACE_API_KEY in your .env file")
+        print("2. Installed required packages: pip install httpx tenacity python-dotenv numpy cachetools")
+
+
+if __name__ == "__main__":
+    # This is equivalent to running the sentence-transformers example
+    asyncio.run(main())
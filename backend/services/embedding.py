@@ -1,103 +1,12 @@
-# import httpx
-# import asyncio
-# from typing import List
-# from tenacity import retry, stop_after_attempt, wait_exponential
-# import os
-# from dotenv import load_dotenv
-
-# load_dotenv()
-
-# HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
-# EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-# HF_API_URL = f"https://api-inference.huggingface.co/models/{EMBEDDING_MODEL}"
-
-# headers = {
-#     "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-#     "Content-Type": "application/json"
-# }
-
-
-# @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-# async def get_embeddings(texts: List[str]) -> List[List[float]]:
-#     """
-#     Get embeddings for a list of texts using Hugging Face Inference API
-#     """
-#     if not texts:
-#         return []
-    
-#     try:
-#         async with httpx.AsyncClient() as client:
-#             # Make request to Hugging Face API
-#             response = await client.post(
-#                 HF_API_URL,
-#                 headers=headers,
-#                 json={
-#                     "inputs": texts,
-#                     "options": {"wait_for_model": True}
-#                 },
-#                 timeout=30.0
-#             )
-        
-#         if response.status_code == 200:
-#             embeddings = response.json()
-            
-#             # Handle different response formats
-#             if isinstance(embeddings, list) and len(embeddings) > 0:
-#                 # If single text, wrap in list
-#                 if isinstance(embeddings[0], (int, float)):
-#                     return [embeddings]
-#                 # If multiple texts
-#                 return embeddings
-#             else:
-#                 raise Exception(f"Unexpected response format: {embeddings}")
-        
-#         elif response.status_code == 503:
-#             # Model is loading, wait and retry
-#             await asyncio.sleep(20)
-#             raise Exception("Model is loading, retrying...")
-        
-#         else:
-#             raise Exception(f"HF API error: {response.status_code} - {response.text}")
-    
-#     except httpx.RequestError as e:
-#         raise Exception(f"Request failed: {str(e)}")
-#     except Exception as e:
-#         raise Exception(f"Embedding generation failed: {str(e)}")
-
-
-# async def get_single_embedding(text: str) -> List[float]:
-#     """
-#     Get embedding for a single text
-#     """
-#     embeddings = await get_embeddings([text])
-#     return embeddings[0] if embeddings else []
-
-
-# async def get_batch_embeddings(texts: List[str], batch_size: int = 10) -> List[List[float]]:
-#     """
-#     Get embeddings for a large list of texts in batches
-#     """
-#     all_embeddings = []
-    
-#     for i in range(0, len(texts), batch_size):
-#         batch = texts[i:i + batch_size]
-#         batch_embeddings = await get_embeddings(batch)
-#         all_embeddings.extend(batch_embeddings)
-        
-#         # Small delay between batches to respect rate limits
-#         if i + batch_size < len(texts):
-#             await asyncio.sleep(1)
-    
-#     return all_embeddings
-
 import httpx
 import asyncio
+import hashlib
 from typing import List
 from tenacity import retry, stop_after_attempt, wait_exponential
 import os
 from dotenv import load_dotenv
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from cachetools import LRUCache
 
 load_dotenv()
 
@@ -110,56 +19,93 @@ headers = {
     "Content-Type": "application/json"
 }
 
+# Shared client so keep-alive connections (and TLS sessions) are reused across requests
+_CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+    headers=headers,
+    timeout=60.0
+)
+
+# Texts per Hugging Face request, and maximum concurrent requests in get_batch_embeddings
+EMBEDDING_BATCH_SIZE = 32
+MAX_IN_FLIGHT = 8
+
+# Question embedding cache, keyed on normalized text; vectors kept as float16 to halve memory
+QUESTION_CACHE_SIZE = 4096
+_question_cache = LRUCache(maxsize=QUESTION_CACHE_SIZE)
+
+# Document chunk embedding cache, keyed on a content hash so repeated boilerplate is embedded once
+CHUNK_CACHE_SIZE = 50000
+_chunk_cache = LRUCache(maxsize=CHUNK_CACHE_SIZE)
+
+
+def _parse_embeddings(response_json, expected_count: int) -> List[List[float]]:
+    """
+    Normalize a batched Hugging Face response into one sentence embedding per text.
+    Token-level outputs are mean-pooled client-side.
+    """
+    if not isinstance(response_json, list) or len(response_json) == 0:
+        raise Exception(f"Unexpected response format: {response_json}")
+    
+    # A single flat vector
+    if isinstance(response_json[0], (int, float)):
+        response_json = [response_json]
+    
+    embeddings = []
+    for embedding in response_json:
+        if embedding and isinstance(embedding[0], list):
+            # Token-level output, mean-pool to get the sentence vector
+            embeddings.append(np.mean(np.asarray(embedding, dtype=np.float32), axis=0).tolist())
+        else:
+            embeddings.append(embedding)
+    
+    if len(embeddings) != expected_count:
+        raise Exception(f"Expected {expected_count} embeddings, got {len(embeddings)}")
+    
+    return embeddings
+
+
+def _retry_after_seconds(response: httpx.Response, default: float = 1.0) -> float:
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 async def get_embeddings(texts: List[str]) -> List[List[float]]:
     """
-    Get embeddings for a list of texts using Hugging Face Inference API
+    Get embeddings for a list of texts using Hugging Face Inference API (one request)
     """
     if not texts:
         return []
     
     try:
-        async with httpx.AsyncClient() as client:
-            # For sentence-transformers models, we need to send each text individually
-            all_embeddings = []
-            
-            for text in texts:
-                # Make request to Hugging Face API
-                response = await client.post(
-                    HF_API_URL,
-                    headers=headers,
-                    json={"inputs": text},
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    embedding = response.json()
-                    
-                    # Handle different response formats
-                    if isinstance(embedding, list) and len(embedding) > 0:
-                        # If it's already a flat list of numbers, use it directly
-                        if isinstance(embedding[0], (int, float)):
-                            all_embeddings.append(embedding)
-                        # If it's nested, take the first one
-                        else:
-                            all_embeddings.append(embedding[0] if embedding[0] else [])
-                    else:
-                        raise Exception(f"Unexpected response format: {embedding}")
-                
-                elif response.status_code == 503:
-                    # Model is loading, wait and retry
-                    await asyncio.sleep(20)
-                    raise Exception("Model is loading, retrying...")
-                
-                else:
-                    raise Exception(f"HF API error: {response.status_code} - {response.text}")
-                
-                # Small delay between requests to respect rate limits
-                if len(texts) > 1:
-                    await asyncio.sleep(0.1)
-            
-            return all_embeddings
+        # Make request to Hugging Face API
+        response = await _CLIENT.post(
+            HF_API_URL,
+            json={
+                "inputs": texts,
+                "options": {"wait_for_model": True}
+            }
+        )
+        
+        if response.status_code == 200:
+            return _parse_embeddings(response.json(), len(texts))
+        
+        elif response.status_code == 429:
+            # Rate limited, honour Retry-After before retrying
+            await asyncio.sleep(_retry_after_seconds(response))
+            raise Exception("Rate limited, retrying...")
+        
+        elif response.status_code == 503:
+            # Model is loading, wait and retry
+            await asyncio.sleep(20)
+            raise Exception("Model is loading, retrying...")
+        
+        else:
+            raise Exception(f"HF API error: {response.status_code} - {response.text}")
     
     except httpx.RequestError as e:
         raise Exception(f"Request failed: {str(e)}")
@@ -167,106 +113,101 @@ async def get_embeddings(texts: List[str]) -> List[List[float]]:
         raise Exception(f"Embedding generation failed: {str(e)}")
 
 
-async def get_single_embedding(text: str) -> List[float]:
+async def close_embedding_client():
     """
-    Get embedding for a single text
+    Close the shared Hugging Face HTTP client (called on app shutdown)
     """
-    embeddings = await get_embeddings([text])
-    return embeddings[0] if embeddings else []
+    await _CLIENT.aclose()
+
+
+def _content_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
 
-async def get_batch_embeddings(texts: List[str], batch_size: int = 10) -> List[List[float]]:
+def _normalize_question(text: str) -> str:
+    return text.strip().lower()
+
+
+async def get_question_embeddings(texts: List[str]) -> List[List[float]]:
     """
-    Get embeddings for a large list of texts in batches
+    Get embeddings for question texts, serving repeated questions from the LRU cache.
+    Only cache misses are sent to the Hugging Face API, in a single call.
     """
-    all_embeddings = []
+    keys = [_normalize_question(text) for text in texts]
+    results = [None] * len(texts)
     
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        batch_embeddings = await get_embeddings(batch)
-        all_embeddings.extend(batch_embeddings)
-        
-        # Small delay between batches to respect rate limits
-        if i + batch_size < len(texts):
-            await asyncio.sleep(1)
+    # The normalized text is only the cache key; the first original text seen
+    # for each uncached key is what gets embedded
+    misses = {}
+    for i, key in enumerate(keys):
+        cached = _question_cache.get(key)
+        if cached is not None:
+            results[i] = cached.astype(np.float32).tolist()
+        else:
+            misses.setdefault(key, []).append(i)
     
-    return all_embeddings
+    if misses:
+        embeddings = await get_embeddings([texts[indices[0]] for indices in misses.values()])
+        for (key, indices), embedding in zip(misses.items(), embeddings):
+            if embedding:
+                _question_cache[key] = np.asarray(embedding, dtype=np.float16)
+            # Fresh vectors are returned at full precision, not via the float16 copy
+            for i in indices:
+                results[i] = embedding or []
+    
+    return results
 
 
-def calculate_similarity(embeddings: List[List[float]]) -> np.ndarray:
+async def get_single_embedding(text: str) -> List[float]:
     """
-    Calculate cosine similarity matrix for embeddings
-    Similar to model.similarity() in sentence-transformers
+    Get embedding for a single question text
     """
-    embeddings_array = np.array(embeddings)
-    return cosine_similarity(embeddings_array)
+    embeddings = await get_question_embeddings([text])
+    return embeddings[0] if embeddings else []
 
 
-def find_most_similar(query_embedding: List[float], 
-                     candidate_embeddings: List[List[float]], 
-                     top_k: int = 5) -> List[tuple]:
+async def get_batch_embeddings(
+    texts: List[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT
+) -> List[List[float]]:
     """
-    Find most similar embeddings to a query embedding
-    Returns list of (index, similarity_score) tuples
+    Get embeddings for a large list of texts in batches.
+    Texts already seen (by content hash) are served from the chunk cache; the
+    remaining unique texts are sorted by length and sent in concurrent
+    batches, at most max_in_flight at a time. Results keep the input order.
     """
-    query_array = np.array(query_embedding).reshape(1, -1)
-    candidates_array = np.array(candidate_embeddings)
-    
-    similarities = cosine_similarity(query_array, candidates_array)[0]
+    keys = [_content_key(text) for text in texts]
     
-    # Get top k indices and scores
-    top_indices = np.argsort(similarities)[::-1][:top_k]
-    return [(int(idx), float(similarities[idx])) for idx in top_indices]
-
-
-async def main():
-    """
-    Main function - equivalent to the sentence-transformers example
-    """
-    # Same sentences as in the HF example
-    sentences = [
-        "That is a happy person",
-        "That is a happy dog",
-        "That is a very happy person",
-        "Today is a sunny day"
-    ]
+    # Resolve cache hits up front so inserting misses can't evict them
+    embeddings_by_key = {}
+    miss_texts = {}
+    for key, text in zip(keys, texts):
+        if key in embeddings_by_key or key in miss_texts:
+            continue
+        cached = _chunk_cache.get(key)
+        if cached is not None:
+            embeddings_by_key[key] = cached.astype(np.float32).tolist()
+        else:
+            miss_texts[key] = text
     
-    print("Getting embeddings from Hugging Face API...")
-    try:
-        # Get embeddings (equivalent to model.encode(sentences))
-        embeddings = await get_embeddings(sentences)
-        print(f"✓ Successfully got {len(embeddings)} embeddings")
-        print(f"✓ Each embedding has {len(embeddings[0])} dimensions")
+    if miss_texts:
+        # Batch similar lengths together so the model pads as little as possible
+        miss_keys = sorted(miss_texts, key=lambda key: len(miss_texts[key]))
+        miss_list = [miss_texts[key] for key in miss_keys]
+        batches = [miss_list[i:i + batch_size] for i in range(0, len(miss_list), batch_size)]
+        semaphore = asyncio.Semaphore(max_in_flight)
         
-        # Calculate similarities (equivalent to model.similarity(embeddings, embeddings))
-        similarities = calculate_similarity(embeddings)
-        print(f"✓ Similarity matrix shape: {similarities.shape}")  # Should be [4, 4]
+        async def _embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await get_embeddings(batch)
         
-        # Print the similarity matrix
-        print("\nSimilarity Matrix:")
-        print(similarities)
+        batch_results = await asyncio.gather(*[_embed_batch(batch) for batch in batches])
         
-        # Show detailed similarities
-        print("\nDetailed Similarities:")
-        for i, sentence1 in enumerate(sentences):
-            print(f"\n'{sentence1}':")
-            for j, sentence2 in enumerate(sentences):
-                if i != j:  # Skip self-similarity
-                    print(f"  vs '{sentence2}': {similarities[i][j]:.4f}")
-        
-        # Find most similar to first sentence
-        print(f"\nMost similar to '{sentences[0]}':")
-        most_similar = find_most_similar(embeddings[0], embeddings)
-        for idx, score in most_similar:
-            print(f"  {idx}: '{sentences[idx]}' - {score:.4f}")
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        print("Make sure you have:")
-        print("1. Set HUGGINGFACE_API_KEY in your .env file")
-        print("2. Installed required packages: pip install httpx tenacity python-dotenv numpy scikit-learn")
-
-
-if __name__ == "__main__":
-    # This is equivalent to running the sentence-transformers example
-    asyncio.run(main())
\ No newline at end of file
+        miss_embeddings = [embedding for batch_embeddings in batch_results for embedding in batch_embeddings]
+        for key, embedding in zip(miss_keys, miss_embeddings):
+            embeddings_by_key[key] = embedding
+            if embedding:
+                _chunk_cache[key] = np.asarray(embedding, dtype=np.float16)
+    
+    return [embeddings_by_key[key] for key in keys]
@@ -1,5 +1,5 @@
 import google.generativeai as genai
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 import os
 from dotenv import load_dotenv
 
@@ -10,27 +10,34 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel('gemini-1.5-flash-8b')
 
 
-async def generate_answer(question: str, context_chunks: List[Dict]) -> str:
+def _build_answer_prompt(question: str, context_chunks: List[Dict]) -> str:
     """
-    Generate answer using Gemini API with context chunks
+    Build the question-answering prompt from retrieved context chunks
     """
-    try:
-        # Format context
-        context_text = "\n\n".join([
-            f"Source: {chunk['document_name']}\nContent: {chunk['text']}"
-            for chunk in context_chunks
-        ])
-        
-        # Create prompt
-        prompt = f"""Context:
+    # Format context
+    context_text = "\n\n".join([
+        f"Source: {chunk['document_name']}\nContent: {chunk['text']}"
+        for chunk in context_chunks
+    ])
+    
+    # Create prompt
+    return f"""Context:
 {context_text}
 
 Question: {question}
 
 Based on the provided context, please answer the question. If the answer cannot be found in the context, please say so. Be specific and cite relevant information from the sources when possible."""
 
+
+async def generate_answer(question: str, context_chunks: List[Dict]) -> str:
+    """
+    Generate answer using Gemini API with context chunks
+    """
+    try:
+        prompt = _build_answer_prompt(question, context_chunks)
+
         # Generate response
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         
         if response.text:
             return response.text.strip()
@@ -41,6 +48,23 @@ Based on the provided context, please answer the question. If the answer cannot
         raise Exception(f"Failed to generate answer: {str(e)}")
 
 
+async def generate_answer_stream(question: str, context_chunks: List[Dict]) -> AsyncIterator[str]:
+    """
+    Generate answer using Gemini API with context chunks, yielding text as it is produced
+    """
+    try:
+        prompt = _build_answer_prompt(question, context_chunks)
+        
+        response = await model.generate_content_async(prompt, stream=True)
+        
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    
+    except Exception as e:
+        raise Exception(f"Failed to generate answer: {str(e)}")
+
+
 async def generate_document_summary(text: str, max_length: int = 200) -> str:
     """
     Generate a summary of a document using Gemini API
@@ -52,7 +76,7 @@ async def generate_document_summary(text: str, max_length: int = 200) -> str:
 
 Summary:"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         
         if response.text:
             return response.text.strip()
@@ -74,7 +98,7 @@ async def extract_keywords(text: str) -> List[str]:
 
 Keywords:"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         
         if response.text:
             keywords = [kw.strip() for kw in response.text.strip().split(',')]
@@ -1,10 +1,20 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, PayloadSchemaType
-from typing import List, Dict, Optional
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, Filter, FieldCondition, MatchValue, MatchAny, PayloadSchemaType, QueryRequest, FilterSelector, Batch,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, OptimizersConfigDiff, DatetimeRange, Datatype,
+    SearchParams, QuantizationSearchParams
+)
+from typing import List, Dict, Optional, Tuple, Union
 import uuid
-from datetime import datetime
+import asyncio
+import hashlib
+import numpy as np
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
+from cachetools import TTLCache
 
 load_dotenv()
 
@@ -12,74 +22,169 @@ load_dotenv()
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "documents")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+
+# Payload indexes for the fields we filter on
+PAYLOAD_INDEXES = {
+    "user_id": PayloadSchemaType.KEYWORD,
+    "document_id": PayloadSchemaType.KEYWORD,
+    "created_at": PayloadSchemaType.DATETIME,
+}
+
+# Set once the collection and its payload indexes have been verified; the lock
+# keeps concurrent first callers from bootstrapping twice. asyncio locks belong
+# to one event loop, so they are created per running loop (see _loop_lock).
+_collection_ready = False
+_collection_locks = weakref.WeakKeyDictionary()
+
+# Indexing threshold (KB of vectors per segment before HNSW is built)
+INDEXING_THRESHOLD = 20000
+
+# Namespace for deterministic point ids derived from (document_id, chunk_index)
+POINT_ID_NAMESPACE = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+
+# Points per upsert request when storing document chunks, and upserts in flight at once
+UPSERT_BATCH_SIZE = 256
+UPSERT_MAX_IN_FLIGHT = 4
+
+# Search the int8 quantized vectors with 2x oversampling, then rescore the
+# candidates against the original vectors so top-k ordering keeps full precision
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+# Queries per query_batch_points call; larger batches are split and sent
+# concurrently so Qdrant can work on them in parallel
+SEARCH_BATCH_SIZE = 8
 
-# Initialize Qdrant client
-client = QdrantClient(
+# Search result cache keyed on (user_id, document_ids, query digest, limit); entries
+# for a user are dropped whenever that user's points change. The cache and its
+# invalidation are per process, so with several uvicorn workers a write in one
+# worker is not seen by the others: the short TTL bounds how stale they can be,
+# and searches across all of a user's documents (no document_ids), which are the
+# ones a new or deleted document changes, are never cached.
+SEARCH_CACHE_SIZE = 2000
+SEARCH_CACHE_TTL = 5
+_search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+# Collection info cache: (timestamp, value), refreshed at most every COLLECTION_INFO_TTL seconds
+COLLECTION_INFO_TTL = 5
+_collection_info_cache: Optional[Tuple[float, Dict]] = None
+_collection_info_locks = weakref.WeakKeyDictionary()
+
+# Initialize Qdrant client (gRPC for the hot paths; one HTTP/2 channel multiplexes concurrent calls)
+client = AsyncQdrantClient(
+    url=QDRANT_URL,
+    api_key=QDRANT_API_KEY,
+    prefer_grpc=True,
+    grpc_port=QDRANT_GRPC_PORT,
+    grpc_options={
+        "grpc.max_send_message_length": 64 * 1024 * 1024,
+        "grpc.max_receive_message_length": 64 * 1024 * 1024,
+    },
+    timeout=10,
+)
+
+# REST client for collection/index admin calls, which are rare and not worth gRPC schema churn
+admin_client = AsyncQdrantClient(
     url=QDRANT_URL,
     api_key=QDRANT_API_KEY,
 )
 
 
+async def close_qdrant_clients():
+    """
+    Close the gRPC channels and HTTP connection pools (call on shutdown)
+    """
+    await client.close()
+    await admin_client.close()
+
+
+def _loop_lock(locks: weakref.WeakKeyDictionary) -> asyncio.Lock:
+    """
+    Get the lock for the running event loop, creating it on first use
+    """
+    loop = asyncio.get_running_loop()
+    lock = locks.get(loop)
+    if lock is None:
+        lock = locks[loop] = asyncio.Lock()
+    return lock
+
+
 async def ensure_collection_exists():
     """
-    Ensure the collection exists in Qdrant with proper indexes
+    Ensure the collection exists in Qdrant with proper indexes.
+    After the first success this returns immediately.
     """
-    try:
-        collections = client.get_collections()
-        collection_names = [col.name for col in collections.collections]
+    global _collection_ready
+    
+    if _collection_ready:
+        return
+    
+    async with _loop_lock(_collection_locks):
+        if _collection_ready:
+            return
         
-        if COLLECTION_NAME not in collection_names:
-            # Create collection
-            client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-            )
-            print(f"Created collection: {COLLECTION_NAME}")
-            
-            # Create indexes for fields we filter on
-            client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="user_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("Created index for user_id")
-            
-            client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="document_id", 
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("Created index for document_id")
-            
-        else:
-            print(f"Collection {COLLECTION_NAME} already exists")
+        try:
+            collections = await admin_client.get_collections()
+            collection_names = [col.name for col in collections.collections]
             
-            # Check if indexes exist, create them if they don't
-            try:
-                collection_info = client.get_collection(COLLECTION_NAME)
-                # Try to create indexes (they will be ignored if they already exist)
-                try:
-                    client.create_payload_index(
+            if COLLECTION_NAME not in collection_names:
+                # Create collection
+                await admin_client.create_collection(
+                    collection_name=COLLECTION_NAME,
+                    # Keep original vectors on disk as float16; search runs on int8 quantized copies held in RAM
+                    vectors_config=VectorParams(size=384, distance=Distance.COSINE, on_disk=True, datatype=Datatype.FLOAT16),
+                    quantization_config=ScalarQuantization(
+                        scalar=ScalarQuantizationConfig(
+                            type=ScalarType.INT8,
+                            quantile=0.99,
+                            always_ram=True
+                        )
+                    ),
+                    optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD),
+                    # Chunk text is only read for the final top-k, so keep payloads off the heap
+                    on_disk_payload=True,
+                )
+                print(f"Created collection: {COLLECTION_NAME}")
+                
+                # Create indexes for fields we filter on
+                for field_name, field_schema in PAYLOAD_INDEXES.items():
+                    await admin_client.create_payload_index(
                         collection_name=COLLECTION_NAME,
-                        field_name="user_id",
-                        field_schema=PayloadSchemaType.KEYWORD
+                        field_name=field_name,
+                        field_schema=field_schema
                     )
-                except:
-                    pass  # Index might already exist
-                    
-                try:
-                    client.create_payload_index(
+                    print(f"Created index for {field_name}")
+                
+            else:
+                print(f"Collection {COLLECTION_NAME} already exists")
+                
+                # Earlier versions paused indexing during uploads; a crash mid-upload
+                # could leave it off for good, so turn it back on here
+                info = await admin_client.get_collection(COLLECTION_NAME)
+                if info.config.optimizer_config.indexing_threshold == 0:
+                    await admin_client.update_collection(
                         collection_name=COLLECTION_NAME,
-                        field_name="document_id",
-                        field_schema=PayloadSchemaType.KEYWORD
+                        optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
                     )
-                except:
-                    pass  # Index might already exist
-            except:
-                pass
-    
-    except Exception as e:
-        raise Exception(f"Failed to ensure collection exists: {str(e)}")
+                    print(f"Re-enabled indexing for {COLLECTION_NAME}")
+                
+                # Try to create indexes (they will be ignored if they already exist)
+                for field_name, field_schema in PAYLOAD_INDEXES.items():
+                    try:
+                        await admin_client.create_payload_index(
+                            collection_name=COLLECTION_NAME,
+                            field_name=field_name,
+                            field_schema=field_schema
+                        )
+                    except:
+                        pass  # Index might already exist
+            
+            _collection_ready = True
+        
+        except Exception as e:
+            raise Exception(f"Failed to ensure collection exists: {str(e)}")
 
 
 async def create_required_indexes():
@@ -89,182 +194,266 @@ async def create_required_indexes():
     try:
         print("Creating required indexes...")
         
-        # Create user_id index
-        try:
-            client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="user_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("✓ Created index for user_id")
-        except Exception as e:
-            if "already exists" in str(e).lower() or "index" in str(e).lower():
-                print("✓ Index for user_id already exists")
-            else:
-                print(f"Failed to create user_id index: {e}")
-        
-        # Create document_id index
-        try:
-            client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name="document_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("✓ Created index for document_id")
-        except Exception as e:
-            if "already exists" in str(e).lower() or "index" in str(e).lower():
-                print("✓ Index for document_id already exists")
-            else:
-                print(f"Failed to create document_id index: {e}")
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            try:
+                await admin_client.create_payload_index(
+                    collection_name=COLLECTION_NAME,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+                print(f"✓ Created index for {field_name}")
+            except Exception as e:
+                if "already exists" in str(e).lower() or "index" in str(e).lower():
+                    print(f"✓ Index for {field_name} already exists")
+                else:
+                    print(f"Failed to create {field_name} index: {e}")
                 
     except Exception as e:
         print(f"Error creating indexes: {e}")
         # Don't raise exception, just log it
 
 
-async def store_document_chunks(
+async def store_chunk_batch(
     document_id: str,
     user_id: str,
-    document_name: str,
     chunks: List[str],
-    embeddings: List[List[float]]
+    embeddings: List[List[float]],
+    start_index: int = 0
 ) -> int:
     """
-    Store document chunks with embeddings in Qdrant
+    Upsert one slice of a document's chunks; start_index is the chunk_index of the first chunk.
+    The collection must already exist (see ensure_collection_exists).
     """
     try:
-        await ensure_collection_exists()
+        _invalidate_search_cache(user_id)
         
-        points = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point_id = str(uuid.uuid4())
-            
-            point = PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload={
-                    "document_id": document_id,
-                    "user_id": user_id,
-                    "document_name": document_name,
-                    "chunk_text": chunk,
-                    "chunk_index": i,
-                    "created_at": datetime.utcnow().isoformat(),
-                }
-            )
-            points.append(point)
+        # Build column-oriented batches instead of one validated PointStruct per chunk
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        created_at = datetime.now(timezone.utc).isoformat()
+        semaphore = asyncio.Semaphore(UPSERT_MAX_IN_FLIGHT)
         
-        # Insert points in batches
-        batch_size = 100
-        for i in range(0, len(points), batch_size):
-            batch = points[i:i + batch_size]
-            client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=batch
-            )
+        async def _upsert_slice(offset: int):
+            async with semaphore:
+                # Points are built only once a slot is free, so at most
+                # UPSERT_MAX_IN_FLIGHT batches of payloads exist at a time
+                slice_start = start_index + offset
+                slice_chunks = chunks[offset:offset + UPSERT_BATCH_SIZE]
+                await client.upsert(
+                    collection_name=COLLECTION_NAME,
+                    points=Batch(
+                        # Deterministic ids, so overlapping uploads of one document overwrite rather than duplicate chunks
+                        ids=[str(uuid.uuid5(POINT_ID_NAMESPACE, f"{document_id}:{i}")) for i in range(slice_start, slice_start + len(slice_chunks))],
+                        vectors=vectors[offset:offset + UPSERT_BATCH_SIZE].tolist(),
+                        payloads=[
+                            {
+                                "document_id": document_id,
+                                "user_id": user_id,
+                                "chunk_text": chunk,
+                                "chunk_index": i,
+                                "created_at": created_at,
+                            }
+                            for i, chunk in enumerate(slice_chunks, start=slice_start)
+                        ]
+                    ),
+                    # Skip the per-batch apply acknowledgement; bulk ingest tolerates eventual visibility
+                    wait=False
+                )
         
-        return len(points)
+        await asyncio.gather(*[_upsert_slice(offset) for offset in range(0, len(chunks), UPSERT_BATCH_SIZE)])
+        
+        return len(chunks)
     
     except Exception as e:
         raise Exception(f"Failed to store document chunks: {str(e)}")
 
 
+def _build_search_filter(user_id: str, document_ids: Optional[List[str]] = None) -> Filter:
+    """
+    Build the user/document filter used for similarity search
+    """
+    filter_conditions = [
+        FieldCondition(key="user_id", match=MatchValue(value=user_id))
+    ]
+    
+    if document_ids:
+        # Filter by specific documents
+        if isinstance(document_ids, str):
+            document_ids = [document_ids]
+        filter_conditions.append(
+            FieldCondition(key="document_id", match=MatchAny(any=document_ids))
+        )
+    
+    return Filter(must=filter_conditions)
+
+
+def _search_cache_key(query_vector: np.ndarray, user_id: str, document_ids: Optional[List[str]], limit: int) -> tuple:
+    if isinstance(document_ids, str):
+        document_ids = [document_ids]
+    digest = hashlib.blake2b(query_vector.tobytes(), digest_size=16).digest()
+    return (user_id, tuple(sorted(document_ids or ())), digest, limit)
+
+
+def _invalidate_search_cache(user_id: Optional[str] = None):
+    """
+    Drop cached search results for a user, or all of them when user_id is None
+    """
+    if user_id is None:
+        _search_cache.clear()
+        return
+    
+    for key in [key for key in list(_search_cache.keys()) if key[0] == user_id]:
+        _search_cache.pop(key, None)
+
+
+def _invalidate_collection_info():
+    """
+    Forget the cached collection info so the next call reports fresh counts
+    """
+    global _collection_info_cache
+    _collection_info_cache = None
+
+
+def _format_search_results(search_result) -> List[Dict]:
+    """
+    Convert scored points into the chunk dicts returned to callers
+    """
+    results = []
+    for point in search_result:
+        results.append({
+            "id": point.id,
+            "score": point.score,
+            "document_id": point.payload["document_id"],
+            # Only points stored before payloads were slimmed carry the name;
+            # callers fill it in from the documents table otherwise
+            "document_name": point.payload.get("document_name"),
+            "text": point.payload["chunk_text"],
+            "chunk_index": point.payload["chunk_index"]
+        })
+    
+    return results
+
+
 async def search_similar_chunks(
     query_embedding: List[float],
     user_id: str,
     document_ids: Optional[List[str]] = None,
-    limit: int = 5
+    limit: int = 3
 ) -> List[Dict]:
     """
     Search for similar chunks in Qdrant
     """
     try:
-        # Ensure collection and indexes exist
-        await ensure_collection_exists()
-        await create_required_indexes()
-        
-        # Build filter
-        filter_conditions = [
-            FieldCondition(key="user_id", match=MatchValue(value=user_id))
-        ]
-        
-        if document_ids:
-            # Filter by specific documents
-            if isinstance(document_ids, list) and len(document_ids) > 1:
-                # Use MatchAny for multiple document IDs
-                filter_conditions.append(
-                    FieldCondition(key="document_id", match=MatchAny(any=document_ids))
-                )
-            elif isinstance(document_ids, list) and len(document_ids) == 1:
-                # Use MatchValue for single document ID
-                filter_conditions.append(
-                    FieldCondition(key="document_id", match=MatchValue(value=document_ids[0]))
-                )
-            else:
-                # If document_ids is a string, use MatchValue
-                filter_conditions.append(
-                    FieldCondition(key="document_id", match=MatchValue(value=document_ids))
-                )
-        
-        search_filter = Filter(must=filter_conditions)
+        # One float32 conversion, shared by the cache key and the request
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        cache_key = _search_cache_key(query_vector, user_id, document_ids, limit) if document_ids else None
+        cached = _search_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
         
         # Search
-        search_result = client.search(
+        search_result = await client.query_points(
             collection_name=COLLECTION_NAME,
-            query_vector=query_embedding,
-            query_filter=search_filter,
+            query=query_vector,
+            query_filter=_build_search_filter(user_id, document_ids),
+            search_params=SEARCH_PARAMS,
             limit=limit,
             with_payload=True
         )
         
-        # Format results
-        results = []
-        for point in search_result:
-            results.append({
-                "id": point.id,
-                "score": point.score,
-                "document_id": point.payload["document_id"],
-                "document_name": point.payload["document_name"],
-                "text": point.payload["chunk_text"],
-                "chunk_index": point.payload["chunk_index"]
-            })
-        
+        results = _format_search_results(search_result.points)
+        if cache_key:
+            _search_cache[cache_key] = results
         return results
     
     except Exception as e:
         raise Exception(f"Failed to search similar chunks: {str(e)}")
 
 
-async def delete_document_vectors(document_id: str, user_id: str) -> int:
+async def search_similar_chunks_batch(queries: List[Dict]) -> List[List[Dict]]:
     """
-    Delete all vectors for a specific document
+    Run several similarity searches in a single Qdrant round-trip.
+    Each query is a dict with query_embedding, user_id, document_ids and limit;
+    results are returned in the same order as the queries.
     """
+    if not queries:
+        return []
+    
     try:
-        # Search for all points with this document_id and user_id
-        search_filter = Filter(
-            must=[
-                FieldCondition(key="document_id", match=MatchValue(value=document_id)),
-                FieldCondition(key="user_id", match=MatchValue(value=user_id))
+        query_vectors = [np.asarray(query["query_embedding"], dtype=np.float32) for query in queries]
+        cache_keys = [
+            _search_cache_key(query_vector, query["user_id"], query.get("document_ids"), query.get("limit", 3))
+            if query.get("document_ids") else None
+            for query_vector, query in zip(query_vectors, queries)
+        ]
+        results = [_search_cache.get(cache_key) if cache_key else None for cache_key in cache_keys]
+        
+        # Only send the queries that missed the cache
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            requests = [
+                QueryRequest(
+                    query=query_vectors[i].tolist(),
+                    filter=_build_search_filter(queries[i]["user_id"], queries[i].get("document_ids")),
+                    params=SEARCH_PARAMS,
+                    limit=queries[i].get("limit", 3),
+                    with_payload=True
+                )
+                for i in misses
             ]
-        )
+            
+            batch_results = await asyncio.gather(*[
+                client.query_batch_points(
+                    collection_name=COLLECTION_NAME,
+                    requests=requests[j:j + SEARCH_BATCH_SIZE]
+                )
+                for j in range(0, len(requests), SEARCH_BATCH_SIZE)
+            ])
+            
+            search_results = [search_result for batch_result in batch_results for search_result in batch_result]
+            for i, search_result in zip(misses, search_results):
+                results[i] = _format_search_results(search_result.points)
+                if cache_keys[i]:
+                    _search_cache[cache_keys[i]] = results[i]
+        
+        return results
+    
+    except Exception as e:
+        raise Exception(f"Failed to search similar chunks: {str(e)}")
+
+
+async def delete_document_vectors(document_ids: Union[str, List[str]], user_id: Optional[str]) -> int:
+    """
+    Delete all vectors for one or more documents in a single filtered delete.
+    user_id=None skips the ownership condition (used by the scheduled cleanup).
+    """
+    try:
+        if isinstance(document_ids, str):
+            document_ids = [document_ids]
+        
+        if not document_ids:
+            return 0
+        
+        conditions = [FieldCondition(key="document_id", match=MatchAny(any=document_ids))]
+        if user_id is not None:
+            conditions.append(FieldCondition(key="user_id", match=MatchValue(value=user_id)))
+        delete_filter = Filter(must=conditions)
         
-        # Get all points for this document
-        search_result = client.scroll(
+        # Count matching points so callers can report how many were removed
+        count_result = await client.count(
             collection_name=COLLECTION_NAME,
-            scroll_filter=search_filter,
-            limit=10000,  # Large limit to get all points
-            with_payload=False
+            count_filter=delete_filter,
+            exact=True
         )
         
-        point_ids = [point.id for point in search_result[0]]
-        
-        if point_ids:
-            # Delete points
-            client.delete(
+        if count_result.count:
+            await client.delete(
                 collection_name=COLLECTION_NAME,
-                points_selector=point_ids
+                points_selector=FilterSelector(filter=delete_filter)
             )
+            _invalidate_search_cache(user_id)
+            _invalidate_collection_info()
         
-        return len(point_ids)
+        return count_result.count
     
     except Exception as e:
         raise Exception(f"Failed to delete document vectors: {str(e)}")
@@ -272,50 +461,63 @@ async def delete_document_vectors(document_id: str, user_id: str) -> int:
 
 async def get_collection_info() -> Dict:
     """
-    Get information about the collection
+    Get information about the collection (cached for COLLECTION_INFO_TTL seconds)
     """
-    try:
-        info = client.get_collection(collection_name=COLLECTION_NAME)
-        return {
-            "name": COLLECTION_NAME,
-            "vectors_count": info.vectors_count,
-            "points_count": info.points_count,
-            "status": info.status
-        }
-    except Exception as e:
-        return {"error": str(e)}
+    global _collection_info_cache
+    
+    cached = _collection_info_cache
+    if cached and time.monotonic() - cached[0] < COLLECTION_INFO_TTL:
+        return cached[1]
+    
+    # Single-flight: concurrent callers wait for one upstream request
+    async with _loop_lock(_collection_info_locks):
+        cached = _collection_info_cache
+        if cached and time.monotonic() - cached[0] < COLLECTION_INFO_TTL:
+            return cached[1]
+        
+        try:
+            info = await client.get_collection(collection_name=COLLECTION_NAME)
+            value = {
+                "name": COLLECTION_NAME,
+                "vectors_count": info.vectors_count,
+                "points_count": info.points_count,
+                "status": info.status
+            }
+        except Exception as e:
+            value = {"error": str(e)}
+        
+        _collection_info_cache = (time.monotonic(), value)
+        return value
 
 
 async def delete_old_vectors(days_old: int = 3) -> int:
     """
-    Delete vectors older than specified days
+    Delete vectors older than specified days with a server-side filtered delete
     """
     try:
-        from datetime import datetime, timedelta
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_old)
         
-        cutoff_date = (datetime.utcnow() - timedelta(days=days_old)).isoformat()
+        old_filter = Filter(
+            must=[
+                FieldCondition(key="created_at", range=DatetimeRange(lt=cutoff_date))
+            ]
+        )
         
-        # This is a simplified approach - in production, you might want to 
-        # implement a more sophisticated cleanup strategy
-        search_result = client.scroll(
+        count_result = await client.count(
             collection_name=COLLECTION_NAME,
-            limit=10000,
-            with_payload=True
+            count_filter=old_filter,
+            exact=True
         )
         
-        old_point_ids = []
-        for point in search_result[0]:
-            created_at = point.payload.get("created_at")
-            if created_at and created_at < cutoff_date:
-                old_point_ids.append(point.id)
-        
-        if old_point_ids:
-            client.delete(
+        if count_result.count:
+            await client.delete(
                 collection_name=COLLECTION_NAME,
-                points_selector=old_point_ids
+                points_selector=FilterSelector(filter=old_filter)
             )
+            _invalidate_search_cache()
+            _invalidate_collection_info()
         
-        return len(old_point_ids)
+        return count_result.count
     
     except Exception as e:
         raise Exception(f"Failed to delete old vectors: {str(e)}")
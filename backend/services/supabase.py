@@ -1,18 +1,71 @@
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
 import os
+import asyncio
+import weakref
+import httpx
 import aiofiles
 import tempfile
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-)
+# Async Supabase client (service role key), created on first use and shared so
+# PostgREST and storage calls reuse pooled connections
+_supabase: Optional[AsyncClient] = None
+# Creation lock per running event loop (asyncio locks belong to one loop)
+_supabase_locks = weakref.WeakKeyDictionary()
+
+# Bytes read per chunk when streaming downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Documents deleted per storage/metadata request in the scheduled cleanup
+CLEANUP_BATCH_SIZE = 100
+
+# Shared HTTP client for storage downloads
+_download_client = httpx.AsyncClient(timeout=60)
+
+
+async def get_supabase() -> AsyncClient:
+    """
+    Get the shared async Supabase client
+    """
+    global _supabase
+    
+    if _supabase is None:
+        # Concurrent first requests would otherwise each build (and leak) a client
+        loop = asyncio.get_running_loop()
+        lock = _supabase_locks.get(loop)
+        if lock is None:
+            lock = _supabase_locks[loop] = asyncio.Lock()
+        
+        async with lock:
+            if _supabase is None:
+                _supabase = await acreate_client(
+                    os.getenv("SUPABASE_URL"),
+                    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+                )
+    
+    return _supabase
+
+
+async def close_supabase_clients():
+    """
+    Close the shared Supabase client's HTTP pools and the download client (call on shutdown)
+    """
+    global _supabase
+    
+    if _supabase is not None:
+        # postgrest/storage are created lazily, so only close the ones in use
+        if _supabase._postgrest is not None:
+            await _supabase._postgrest.aclose()
+        if _supabase._storage is not None:
+            await _supabase._storage.aclose()
+        await _supabase.auth.close()
+        _supabase = None
+    
+    await _download_client.aclose()
 
 
 async def get_document_metadata(document_id: str, user_id: str) -> Optional[Dict]:
@@ -20,7 +73,8 @@ async def get_document_metadata(document_id: str, user_id: str) -> Optional[Dict
     Get document metadata from Supabase
     """
     try:
-        response = supabase.table("documents").select("*").eq("id", document_id).eq("user_id", user_id).execute()
+        client = await get_supabase()
+        response = await client.table("documents").select("*").eq("id", document_id).eq("user_id", user_id).execute()
         
         if response.data:
             return response.data[0]
@@ -30,19 +84,60 @@ async def get_document_metadata(document_id: str, user_id: str) -> Optional[Dict
         raise Exception(f"Failed to get document metadata: {str(e)}")
 
 
-async def get_user_documents(user_id: str) -> List[Dict]:
+# Columns returned by document listings
+DOCUMENT_LIST_COLUMNS = "id,name,file_type,file_size,status,error_message,created_at,updated_at"
+
+
+async def get_user_documents(
+    user_id: str,
+    status: Optional[str] = None,
+    limit: Optional[int] = 100,
+    offset: int = 0
+) -> Tuple[List[Dict], int]:
     """
-    Get all documents for a user
+    Get a page of documents for a user, filtered and paginated in the database.
+    Returns the rows and the total number of matching documents.
     """
     try:
-        response = supabase.table("documents").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        client = await get_supabase()
+        query = client.table("documents").select(DOCUMENT_LIST_COLUMNS, count="exact").eq("user_id", user_id)
         
-        return response.data or []
+        if status:
+            query = query.eq("status", status)
+        
+        query = query.order("created_at", desc=True)
+        
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        
+        response = await query.execute()
+        
+        documents = response.data or []
+        total_count = response.count if response.count is not None else len(documents)
+        
+        return documents, total_count
     
     except Exception as e:
         raise Exception(f"Failed to get user documents: {str(e)}")
 
 
+async def get_user_document_stats(user_id: str) -> List[Dict]:
+    """
+    Get aggregated document statistics for a user via the documents_stats RPC.
+    Rows carry status, file_type, count and total_size; a row has status set for
+    the per-status groups, file_type set for the per-type groups, and neither
+    for the overall total.
+    """
+    try:
+        client = await get_supabase()
+        response = await client.rpc("documents_stats", {"user_id": user_id}).execute()
+        
+        return response.data or []
+    
+    except Exception as e:
+        raise Exception(f"Failed to get document stats: {str(e)}")
+
+
 async def update_document_status(document_id: str, status: str, error_message: Optional[str] = None):
     """
     Update document processing status
@@ -56,7 +151,8 @@ async def update_document_status(document_id: str, status: str, error_message: O
         if error_message:
             update_data["error_message"] = error_message
         
-        supabase.table("documents").update(update_data).eq("id", document_id).execute()
+        client = await get_supabase()
+        await client.table("documents").update(update_data).eq("id", document_id).execute()
     
     except Exception as e:
         raise Exception(f"Failed to update document status: {str(e)}")
@@ -67,7 +163,8 @@ async def delete_document_metadata(document_id: str, user_id: str):
     Delete document metadata from Supabase database
     """
     try:
-        response = supabase.table("documents").delete().eq("id", document_id).eq("user_id", user_id).execute()
+        client = await get_supabase()
+        response = await client.table("documents").delete().eq("id", document_id).eq("user_id", user_id).execute()
         return response
     except Exception as e:
         raise Exception(f"Failed to delete document metadata: {str(e)}")
@@ -81,7 +178,8 @@ async def download_file_from_storage(file_path: str) -> str:
         print(f"Attempting to download file from storage: {file_path}")
         
         # Get signed URL
-        response = supabase.storage.from_("documents").create_signed_url(file_path, 3600)  # 1 hour expiry
+        client = await get_supabase()
+        response = await client.storage.from_("documents").create_signed_url(file_path, 3600)  # 1 hour expiry
         
         if not response.get("signedURL"):
             print(f"Failed to create signed URL for: {file_path}")
@@ -91,24 +189,30 @@ async def download_file_from_storage(file_path: str) -> str:
         signed_url = response["signedURL"]
         print(f"Created signed URL: {signed_url}")
         
-        # Download file
-        import requests
-        print(f"Downloading file from signed URL...")
-        file_response = requests.get(signed_url, timeout=60)
-        file_response.raise_for_status()
-        
-        if len(file_response.content) == 0:
-            raise Exception("Downloaded file is empty")
-        
-        print(f"Downloaded file size: {len(file_response.content)} bytes")
-        
-        # Save to temporary file
+        # Stream the file straight to a temporary file so memory stays flat
         file_extension = os.path.splitext(file_path)[1]
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
+        temp_file.close()
+        
+        print("Downloading file from signed URL...")
+        downloaded_bytes = 0
+        try:
+            async with _download_client.stream("GET", signed_url) as file_response:
+                file_response.raise_for_status()
+                
+                async with aiofiles.open(temp_file.name, 'wb') as f:
+                    async for chunk in file_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
+                        downloaded_bytes += len(chunk)
+            
+            if downloaded_bytes == 0:
+                raise Exception("Downloaded file is empty")
         
-        with open(temp_file.name, 'wb') as f:
-            f.write(file_response.content)
+        except Exception:
+            os.unlink(temp_file.name)
+            raise
         
+        print(f"Downloaded file size: {downloaded_bytes} bytes")
         print(f"Saved temporary file: {temp_file.name}")
         return temp_file.name
     
@@ -123,56 +227,91 @@ async def delete_file_from_storage(file_path: str):
     """
     try:
         # Remove the file from the documents bucket
-        response = supabase.storage.from_("documents").remove([file_path])
+        client = await get_supabase()
+        response = await client.storage.from_("documents").remove([file_path])
         return response
     except Exception as e:
         raise Exception(f"Failed to delete file from storage: {str(e)}")
 
 
-async def cleanup_old_documents(days_old: int = 3) -> int:
+async def delete_files_from_storage(file_paths: List[str]):
+    """
+    Delete several files from Supabase storage in one request
+    """
+    try:
+        client = await get_supabase()
+        response = await client.storage.from_("documents").remove(file_paths)
+        return response
+    except Exception as e:
+        raise Exception(f"Failed to delete files from storage: {str(e)}")
+
+
+async def cleanup_old_documents(days_old: int = 3) -> List[str]:
     """
-    Delete documents older than specified days
+    Delete documents older than specified days, returning the deleted document ids.
+    Work is done in batches of CLEANUP_BATCH_SIZE; a document's metadata is only
+    deleted once storage confirms its file was removed, so no file is orphaned.
     """
     try:
         cutoff_date = (datetime.utcnow() - timedelta(days=days_old)).isoformat()
         
         # Get old documents
-        response = supabase.table("documents").select("*").lt("created_at", cutoff_date).execute()
+        client = await get_supabase()
+        response = await client.table("documents").select("id,file_path").lt("created_at", cutoff_date).execute()
         
         old_documents = response.data or []
-        deleted_count = 0
+        deleted_ids = []
         
-        for doc in old_documents:
+        for start in range(0, len(old_documents), CLEANUP_BATCH_SIZE):
+            batch = old_documents[start:start + CLEANUP_BATCH_SIZE]
+            
             try:
-                # Delete from storage
-                await delete_file_from_storage(doc["file_path"])
+                file_paths = [doc["file_path"] for doc in batch if doc.get("file_path")]
+                
+                # Delete this batch's files in one storage call
+                removed_paths = set()
+                if file_paths:
+                    removed = await delete_files_from_storage(file_paths)
+                    removed_paths = {item.get("name") for item in removed or []}
+                
+                # Documents without a file have nothing to orphan
+                batch_ids = [
+                    doc["id"] for doc in batch
+                    if not doc.get("file_path") or doc["file_path"] in removed_paths
+                ]
                 
-                # Delete metadata
-                await delete_document_metadata(doc["id"], doc["user_id"])
+                skipped = len(batch) - len(batch_ids)
+                if skipped:
+                    print(f"Skipped {skipped} old documents whose files were not removed from storage")
                 
-                deleted_count += 1
+                # Delete this batch's metadata rows in one query
+                if batch_ids:
+                    await client.table("documents").delete().in_("id", batch_ids).execute()
+                    deleted_ids.extend(batch_ids)
             
             except Exception as e:
-                print(f"Failed to delete document {doc['id']}: {str(e)}")
+                print(f"Failed to delete a batch of old documents: {str(e)}")
                 continue
         
-        return deleted_count
+        return deleted_ids
     
     except Exception as e:
         raise Exception(f"Failed to cleanup old documents: {str(e)}")
 
 
-async def get_document_by_ids(document_ids: List[str], user_id: str) -> List[Dict]:
+async def get_documents_for_ask(document_ids: List[str], user_id: str) -> List[Dict]:
     """
-    Get multiple documents by their IDs for a specific user
+    Get the fields needed to validate a question request for the user's documents.
+    Ownership is enforced by the user_id filter.
     """
     try:
-        response = supabase.table("documents").select("*").in_("id", document_ids).eq("user_id", user_id).execute()
+        client = await get_supabase()
+        response = await client.table("documents").select("id,name,status,user_id").in_("id", document_ids).eq("user_id", user_id).execute()
         
         return response.data or []
     
     except Exception as e:
-        raise Exception(f"Failed to get documents by IDs: {str(e)}")
+        raise Exception(f"Failed to get documents for question: {str(e)}")
 
 
 async def create_chat_session(user_id: str, title: str) -> str:
@@ -180,7 +319,8 @@ async def create_chat_session(user_id: str, title: str) -> str:
     Create a new chat session
     """
     try:
-        response = supabase.table("chat_sessions").insert({
+        client = await get_supabase()
+        response = await client.table("chat_sessions").insert({
             "user_id": user_id,
             "title": title,
             "created_at": datetime.utcnow().isoformat(),
@@ -201,7 +341,8 @@ async def save_message(session_id: str, user_id: str, content: str, role: str, s
     Save a chat message
     """
     try:
-        supabase.table("messages").insert({
+        client = await get_supabase()
+        await client.table("messages").insert({
             "session_id": session_id,
             "user_id": user_id,
             "content": content,
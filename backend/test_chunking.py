@@ -0,0 +1,58 @@
+import math
+from utils.chunking import chunk_text, count_tokens, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, MIN_CHUNK_CHARS
+
+
+def _paragraph(index, words=100):
+    # One token per word, no sentence punctuation, ending in a unique marker
+    return " ".join(f"p{index}w{j}" for j in range(words - 1)) + f" END{index}"
+
+
+def _sentences(count):
+    return "".join(f"Sentence {i} has a few words in it. " for i in range(count))
+
+
+def test_chunks_stay_within_token_limit():
+    text = "\n\n".join(_paragraph(i, words=40 + 37 * i) for i in range(12))
+    chunks = chunk_text(text)
+
+    assert chunks
+    assert all(count_tokens(chunk) <= CHUNK_TOKENS for chunk in chunks)
+
+
+def test_chunks_end_on_paragraph_boundaries():
+    text = "\n\n".join(_paragraph(i) for i in range(10))
+    chunks = chunk_text(text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.split()[-1].startswith("END")
+
+
+def test_overlap_carried_into_next_chunk():
+    chunks = chunk_text(_sentences(100))
+
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        end = current.find(last_sentence)
+        assert end > 0
+
+        overlap = current[:end + len(last_sentence)]
+        assert previous.endswith(overlap)
+        assert 0 < count_tokens(overlap) <= CHUNK_OVERLAP_TOKENS
+
+
+def test_text_without_separators_is_hard_split():
+    text = "a," * 1000
+    chunks = chunk_text(text)
+
+    assert len(chunks) == math.ceil(count_tokens(text) / CHUNK_TOKENS)
+    assert "".join(chunks) == text
+    assert all(count_tokens(chunk) <= CHUNK_TOKENS for chunk in chunks)
+
+
+def test_short_chunks_are_dropped():
+    assert chunk_text("too short") == []
+    assert chunk_text("x" * MIN_CHUNK_CHARS) == []
+    assert chunk_text("   \n\n" + "x" * MIN_CHUNK_CHARS + "\n\n   ") == []
+    assert chunk_text("x" * (MIN_CHUNK_CHARS + 1)) == ["x" * (MIN_CHUNK_CHARS + 1)]
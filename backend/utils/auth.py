@@ -2,8 +2,15 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from supabase import create_client
+from cachetools import TTLCache
+import asyncio
+import base64
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
+from services.supabase import get_supabase
 
 load_dotenv()
 
@@ -15,11 +22,26 @@ auth_supabase = create_client(
     os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Fallback to service key if anon key not available
 )
 
-# Initialize Supabase client for admin operations (using service role key)
-admin_supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-)
+# Verified tokens: sha256(token) -> (user_id, expires_at). Entries live at most
+# AUTH_CACHE_TTL seconds and never past the token's own exp claim.
+AUTH_CACHE_TTL = 60
+_auth_cache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL)
+
+# Confirmed (user_id, document_id) ownership; only positive results are cached
+OWNERSHIP_CACHE_TTL = 30
+_ownership_cache = TTLCache(maxsize=10_000, ttl=OWNERSHIP_CACHE_TTL)
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """
+    Read the exp claim from a JWT without verifying it (Supabase already did)
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
@@ -28,9 +50,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """
     try:
         token = credentials.credentials
+        cache_key = hashlib.sha256(token.encode()).digest()
+        
+        cached = _auth_cache.get(cache_key)
+        if cached is not None and cached[1] > time.time():
+            return cached[0]
         
-        # Verify token with Supabase using anon key
-        response = auth_supabase.auth.get_user(token)
+        # Verify token with Supabase using anon key; the client is sync, so
+        # keep the round-trip off the event loop
+        response = await asyncio.get_running_loop().run_in_executor(
+            None, auth_supabase.auth.get_user, token
+        )
         
         if response.user is None:
             raise HTTPException(
@@ -39,6 +69,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        expires_at = time.time() + AUTH_CACHE_TTL
+        token_expiry = _token_expiry(token)
+        if token_expiry is not None:
+            expires_at = min(expires_at, token_expiry)
+        _auth_cache[cache_key] = (response.user.id, expires_at)
+        
         return response.user.id
     
     except Exception as e:
@@ -50,33 +86,32 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
 
 
-def verify_user_owns_document(user_id: str, document_id: str) -> bool:
+async def verify_user_owns_document(user_id: str, document_id: str) -> bool:
     """
     Verify that the user owns the specified document
     """
-    try:
-        response = admin_supabase.table("documents").select("user_id").eq("id", document_id).execute()
-        
-        if not response.data:
-            return False
-            
-        return response.data[0]["user_id"] == user_id
-    
-    except Exception:
-        return False
+    return await verify_user_owns_documents(user_id, [document_id])
 
 
-def verify_user_owns_documents(user_id: str, document_ids: list) -> bool:
+async def verify_user_owns_documents(user_id: str, document_ids: list) -> bool:
     """
     Verify that the user owns all specified documents
     """
     try:
-        response = admin_supabase.table("documents").select("user_id").in_("id", document_ids).execute()
+        unverified = [doc_id for doc_id in set(document_ids) if (user_id, doc_id) not in _ownership_cache]
+        if not unverified:
+            return True
         
-        if len(response.data) != len(document_ids):
+        # Count matching rows server-side instead of transferring them
+        admin_supabase = await get_supabase()
+        response = await admin_supabase.table("documents").select("id", count="exact", head=True).in_("id", unverified).eq("user_id", user_id).execute()
+        
+        if response.count != len(unverified):
             return False
-            
-        return all(doc["user_id"] == user_id for doc in response.data)
+        
+        for doc_id in unverified:
+            _ownership_cache[(user_id, doc_id)] = True
+        return True
     
     except Exception:
         return False
@@ -1,15 +1,39 @@
-import PyPDF2
+import pypdfium2 as pdfium
 import docx
-from typing import List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Tuple
+from collections import deque
+import mmap
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configuration
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+# Configuration (sizes are in approximate tokens: a 256-token window with a 192-token stride)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 64))
+
+# Chunks shorter than this (after stripping) carry too little text to be worth embedding
+MIN_CHUNK_CHARS = 50
+
+# Words and standalone punctuation, a close lower bound on WordPiece token counts
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Split points tried in order: paragraphs, lines, sentences, words. Each split
+# happens after the separator, so it stays at the end of its piece.
+_SPLIT_PATTERNS = [
+    re.compile(r"(?<=\n\n)"),
+    re.compile(r"(?<=\n)"),
+    re.compile(r"(?<=[.?!] )"),
+    re.compile(r"(?<= )"),
+]
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate the number of model tokens in text
+    """
+    return len(_TOKEN_PATTERN.findall(text))
 
 
 def extract_text_from_file(file_path: str, file_type: str) -> str:
@@ -35,50 +59,108 @@ def extract_text_from_file(file_path: str, file_type: str) -> str:
 
 
 def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file"""
-    text = ""
+    """Extract text from PDF file (PDFium backend)"""
+    pdf = pdfium.PdfDocument(file_path)
+    pages = []
     
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_bounded())
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
     
-    return text
+    return "\n".join(pages) + "\n"
 
 
 def extract_text_from_docx(file_path: str) -> str:
     """Extract text from DOCX file"""
     doc = docx.Document(file_path)
-    text = ""
     
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    
-    return text
+    return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
 
 
 def extract_text_from_txt(file_path: str) -> str:
     """Extract text from TXT file"""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return ""
+        
+        # Decode straight from the mapped pages, skipping the bytes copy read() makes
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            text = str(view, 'utf-8', 'replace')
+    
+    # Normalize line endings as text-mode open() would, so paragraph splitting sees \n\n
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _split_by_tokens(text: str) -> List[Tuple[str, int]]:
+    """
+    Hard-split text with no usable separators into CHUNK_TOKENS-sized pieces
+    """
+    starts = [match.start() for match in _TOKEN_PATTERN.finditer(text)][::CHUNK_TOKENS]
+    if not starts:
+        return [(text, 0)]
+    starts[0] = 0
+    
+    bounds = starts + [len(text)]
+    return [(text[a:b], count_tokens(text[a:b])) for a, b in zip(bounds, bounds[1:])]
+
+
+def _split_pieces(text: str, level: int = 0) -> List[Tuple[str, int]]:
+    """
+    Split text into (piece, token_count) pairs of at most CHUNK_TOKENS tokens,
+    using the coarsest boundary that gets each piece under the limit
+    """
+    pieces = []
+    
+    for part in _SPLIT_PATTERNS[level].split(text):
+        if not part:
+            continue
+        
+        tokens = count_tokens(part)
+        if tokens <= CHUNK_TOKENS:
+            pieces.append((part, tokens))
+        elif level + 1 < len(_SPLIT_PATTERNS):
+            pieces.extend(_split_pieces(part, level + 1))
+        else:
+            pieces.extend(_split_by_tokens(part))
+    
+    return pieces
 
 
 def chunk_text(text: str) -> List[str]:
     """
-    Split text into chunks using RecursiveCharacterTextSplitter
+    Split text into token-sized chunks, preferring paragraph, line and
+    sentence boundaries over word breaks, with CHUNK_OVERLAP_TOKENS of
+    overlap between consecutive chunks
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
+    chunks = []
+    window = deque()
+    window_tokens = 0
+    
+    def emit():
+        chunk = "".join(piece for piece, _ in window).strip()
+        # Filter out very short chunks
+        if len(chunk) > MIN_CHUNK_CHARS:
+            chunks.append(chunk)
     
-    chunks = text_splitter.split_text(text)
+    # Greedily pack pieces into windows in a single pass
+    for piece, tokens in _split_pieces(text):
+        if window and window_tokens + tokens > CHUNK_TOKENS:
+            emit()
+            
+            # Carry the tail of this window over as the overlap for the next
+            while window and (window_tokens > CHUNK_OVERLAP_TOKENS or window_tokens + tokens > CHUNK_TOKENS):
+                window_tokens -= window.popleft()[1]
+        
+        window.append((piece, tokens))
+        window_tokens += tokens
     
-    # Filter out very short chunks
-    chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
+    if window:
+        emit()
     
     return chunks
 